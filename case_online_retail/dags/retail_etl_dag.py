@@ -42,12 +42,25 @@ def run_snapshot():
                 snapshot_date   DATE NOT NULL DEFAULT CURRENT_DATE
             )
         """))
+        # Archives created before row fingerprinting have no such column (LIKE only copies at creation)
+        conn.execute(text(
+            "ALTER TABLE staging_online_retail.raw_transactions_archive ADD COLUMN IF NOT EXISTS row_fingerprint BIGINT"
+        ))
  
         # Delete today's snapshot if it exists to ensure idempotency on reruns
         conn.execute(text("DELETE FROM staging_online_retail.raw_transactions_archive WHERE snapshot_date = CURRENT_DATE"))
+        # Explicit column list: on upgraded archives row_fingerprint sits after snapshot_date,
+        # so a positional SELECT * would no longer line up.
         conn.execute(text("""
-            INSERT INTO staging_online_retail.raw_transactions_archive
-            SELECT *, gen_random_uuid(), CURRENT_DATE
+            INSERT INTO staging_online_retail.raw_transactions_archive (
+                invoice_no, stock_code, description, quantity, invoice_date, unit_price,
+                customer_id, country, load_timestamp, batch_id, row_fingerprint,
+                snapshot_id, snapshot_date
+            )
+            SELECT
+                invoice_no, stock_code, description, quantity, invoice_date, unit_price,
+                customer_id, country, load_timestamp, batch_id, row_fingerprint,
+                gen_random_uuid(), CURRENT_DATE
             FROM staging_online_retail.raw_transactions
         """))
 
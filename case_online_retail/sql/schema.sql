@@ -10,10 +10,35 @@ CREATE TABLE IF NOT EXISTS staging_online_retail.raw_transactions (
     customer_id     VARCHAR(20),
     country         VARCHAR(100),
     load_timestamp  TIMESTAMP DEFAULT NOW(),
-    batch_id        UUID DEFAULT gen_random_uuid()
+    batch_id        UUID DEFAULT gen_random_uuid(),
+    row_fingerprint BIGINT
+);
+
+-- Staging tables created before fingerprinting existed
+ALTER TABLE staging_online_retail.raw_transactions ADD COLUMN IF NOT EXISTS row_fingerprint BIGINT;
+
+-- Persistent fingerprint store: one row per distinct raw row ever loaded to fact_sales.
+-- New batches are deduplicated against this index instead of re-scanning history.
+CREATE TABLE IF NOT EXISTS staging_online_retail.row_fingerprints (
+    fingerprint     BIGINT PRIMARY KEY,
+    first_batch_id  UUID NOT NULL,
+    first_seen      TIMESTAMP DEFAULT NOW()
+);
+
+-- Source files loaded by multi-file ingest, keyed by path relative to DATA_PATH:
+-- content_hash makes re-deliveries skip or replace. loaded_at is set once the file's rows are in Gold.
+CREATE TABLE IF NOT EXISTS staging_online_retail.ingested_files (
+    file_path       VARCHAR(1024) PRIMARY KEY,
+    content_hash    CHAR(64) NOT NULL,
+    batch_id        UUID NOT NULL,
+    row_count       INTEGER NOT NULL,
+    ingested_at     TIMESTAMP DEFAULT NOW(),
+    loaded_at       TIMESTAMP
 );
 
 -- Silver Layer (Cleaned Data, Natural Keys)
+-- transform.py builds its shadow tables from these three CREATE TABLE statements (load_silver_tables):
+-- keep the "CREATE TABLE IF NOT EXISTS ... (" / ");" layout and one column per line.
 CREATE SCHEMA IF NOT EXISTS silver_online_retail;
 
 CREATE TABLE IF NOT EXISTS silver_online_retail.products (
@@ -33,7 +58,20 @@ CREATE TABLE IF NOT EXISTS silver_online_retail.transactions (
     date_id         INT,
     quantity        INTEGER,
     unit_price      NUMERIC(10,2),
-    total_value     NUMERIC(12,2)
+    total_value     NUMERIC(12,2),
+    batch_id        UUID NOT NULL,
+    row_ordinal     INTEGER PRIMARY KEY,
+    row_fingerprint BIGINT NOT NULL
+);
+
+-- One row per Silver publish — batch_id is the unit load.py checkpoints against.
+-- Silver holds only the latest batch: staging rows not yet loaded to Gold (see row_fingerprints).
+CREATE TABLE IF NOT EXISTS silver_online_retail.batches (
+    batch_id        UUID PRIMARY KEY,
+    published_at    TIMESTAMP DEFAULT NOW(),
+    source_rows     INTEGER,
+    skipped_rows    INTEGER,
+    source_batch_ids UUID[]
 );
 
 -- DW Layer (Star Schema, Surrogate Keys)
@@ -75,9 +113,20 @@ CREATE TABLE IF NOT EXISTS dw_online_retail.fact_sales (
     total_value     NUMERIC(12,2) NOT NULL,
     load_timestamp  TIMESTAMP DEFAULT NOW(),
     batch_id        UUID DEFAULT gen_random_uuid()
-); 
+);
+
+-- Committed load steps per Silver batch: dims are one row each, facts one row per chunk
+CREATE TABLE IF NOT EXISTS dw_online_retail.load_checkpoints (
+    batch_id        UUID NOT NULL,
+    step            VARCHAR(50) NOT NULL,
+    chunk_start     INTEGER NOT NULL,
+    chunk_end       INTEGER NOT NULL,
+    committed_at    TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (batch_id, step, chunk_start)
+);
 
-CREATE INDEX idx_fact_sales_date ON dw_online_retail.fact_sales(date_id);
-CREATE INDEX idx_fact_sales_product ON dw_online_retail.fact_sales(product_id);
-CREATE INDEX idx_fact_sales_customer ON dw_online_retail.fact_sales(customer_id);
-CREATE INDEX idx_fact_sales_invoice_no ON dw_online_retail.fact_sales(invoice_no);
+CREATE INDEX IF NOT EXISTS idx_fact_sales_date ON dw_online_retail.fact_sales(date_id);
+CREATE INDEX IF NOT EXISTS idx_fact_sales_product ON dw_online_retail.fact_sales(product_id);
+CREATE INDEX IF NOT EXISTS idx_fact_sales_customer ON dw_online_retail.fact_sales(customer_id);
+CREATE INDEX IF NOT EXISTS idx_fact_sales_invoice_no ON dw_online_retail.fact_sales(invoice_no);
+CREATE INDEX IF NOT EXISTS idx_fact_sales_batch ON dw_online_retail.fact_sales(batch_id);
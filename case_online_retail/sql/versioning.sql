@@ -22,13 +22,18 @@ CREATE TABLE IF NOT EXISTS staging_online_retail.raw_transactions_archive (
     country         VARCHAR(100),
     load_timestamp  TIMESTAMP DEFAULT NOW(),
     batch_id        UUID DEFAULT gen_random_uuid(),
+    row_fingerprint BIGINT,
     snapshot_id     UUID NOT NULL,
     snapshot_date   DATE NOT NULL
 );
 
 -- To create a snapshot after each ingest run:
--- INSERT INTO staging_online_retail.raw_transactions_archive
--- SELECT *, gen_random_uuid() as snapshot_id, CURRENT_DATE as snapshot_date
+-- INSERT INTO staging_online_retail.raw_transactions_archive (
+--     invoice_no, stock_code, description, quantity, invoice_date, unit_price,
+--     customer_id, country, load_timestamp, batch_id, row_fingerprint, snapshot_id, snapshot_date
+-- )
+-- SELECT invoice_no, stock_code, description, quantity, invoice_date, unit_price,
+--        customer_id, country, load_timestamp, batch_id, row_fingerprint, gen_random_uuid(), CURRENT_DATE
 -- FROM staging_online_retail.raw_transactions
 
 -- To retrieve a specific day's snapshot:
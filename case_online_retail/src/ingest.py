@@ -1,37 +1,58 @@
 import pandas as pd
 import os
+import glob
+import time
 import uuid
+import hashlib
 import pathlib
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from sqlalchemy import create_engine, text
 from dotenv import load_dotenv
 
 from common.logger import get_logger
+from case_online_retail.src.fingerprint import compute_row_fingerprints
 
 load_dotenv()
 logger = get_logger("Online Retail")
 
+# DATA_PATH can be a single CSV, a directory of CSVs, or a glob (e.g. exports/2026-10-19_*.csv)
 DATA_PATH = os.getenv('DATA_PATH', 'case_online_retail/archive/online_retail.csv')
 DATABASE_URL = os.getenv('DATABASE_URL')
+# Upper bound on files parsed and loaded at once — also the size of the connection pool
+INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', '4'))
 
 SCHEMA_FILE = pathlib.Path(__file__).resolve().parents[1] / "sql" / "schema.sql"
 
-def run_ingest():
-    logger.info("Starting ingestion...")
+def is_multi_file(data_path):
+    return os.path.isdir(data_path) or glob.has_magic(data_path)
 
-    # Run schema.sql first — creates all schemas and tables if they don't exist.
-    # Using IF NOT EXISTS throughout so this is safe and idempotent on every run.
-    engine = create_engine(DATABASE_URL)
-    with engine.begin() as conn:
-        conn.execute(text(SCHEMA_FILE.read_text()))
-    logger.info("Schema initialised")
+def resolve_data_files(data_path):
+    if os.path.isdir(data_path):
+        return sorted(glob.glob(os.path.join(data_path, '*.csv')))
+    if glob.has_magic(data_path):
+        return sorted(glob.glob(data_path))
+    return [data_path]
+
+def file_key(path, data_path):
+    # Registry key: the path relative to the non-wildcard root of DATA_PATH. A basename alone would
+    # collide for exports/*/orders.csv; an absolute path would differ between the app and Airflow mounts.
+    root = data_path if os.path.isdir(data_path) else os.path.dirname(data_path)
+    while glob.has_magic(root):
+        root = os.path.dirname(root)
+    return os.path.relpath(path, root or '.')
 
-    df = pd.read_csv(DATA_PATH, encoding='ISO-8859-1') # the encoding is required for special characters
-    logger.info(f"Loaded {len(df)} rows from {DATA_PATH}")
+# Read as text in every file: a file whose invoice numbers or stock codes happen to be all digits
+# would otherwise be inferred as int, turning '01' into 1 and changing its row fingerprint.
+TEXT_COLUMNS = {col: str for col in ['InvoiceNo', 'StockCode', 'Description', 'InvoiceDate', 'Country']}
+
+def read_source_file(path, batch_id):
+    df = pd.read_csv(path, encoding='ISO-8859-1', dtype=TEXT_COLUMNS) # the encoding is required for special characters
+    logger.info(f"Loaded {len(df)} rows from {path}")
 
     # Add pipeline metadata for observability: allows tracing which run loaded which rows
     df['load_timestamp'] = datetime.now()
-    df['batch_id'] = str(uuid.uuid4())
+    df['batch_id'] = batch_id
 
     # Standardize column names
     df.columns = [c.lower().replace(' ', '_') for c in df.columns]
@@ -45,6 +66,112 @@ def run_ingest():
         'customerid':  'customer_id'
     })
 
+    # Fingerprint each raw row once at ingest — transform dedups on this single column
+    # and against the persistent row_fingerprints store instead of comparing every column.
+    df['row_fingerprint'] = compute_row_fingerprints(df)
+    return df
+
+def file_content_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def ingest_file(engine, path, file_path):
+    started = time.perf_counter()
+    content_hash = file_content_hash(path)
+
+    # Per-file idempotency via ingested_files: the same content is skipped, a re-delivered
+    # file with new content replaces its previous staging rows — never appended a second time.
+    # Lines of the old version already loaded to fact_sales stay there.
+    with engine.connect() as conn:
+        previous = conn.execute(text("""
+            SELECT content_hash, batch_id::text FROM staging_online_retail.ingested_files
+            WHERE file_path = :file_path
+        """), {'file_path': file_path}).fetchone()
+    if previous is not None and previous[0] == content_hash:
+        logger.info(f"Skipping {file_path} — already ingested as batch {previous[1]}")
+        return 0
+
+    batch_id = str(uuid.uuid4())
+    df = read_source_file(path, batch_id)
+
+    # Staging rows and the registry entry commit together, so a failed file is retried cleanly
+    with engine.begin() as conn:
+        if previous is not None:
+            conn.execute(
+                text("DELETE FROM staging_online_retail.raw_transactions WHERE batch_id = CAST(:batch_id AS UUID)"),
+                {'batch_id': previous[1]}
+            )
+            logger.info(f"Replacing {file_path} — content changed since batch {previous[1]}")
+        df.to_sql(
+            'raw_transactions',
+            conn,
+            schema='staging_online_retail',
+            if_exists='append',
+            index=False,
+            method='multi',
+            chunksize=1000
+        )
+        conn.execute(text("""
+            INSERT INTO staging_online_retail.ingested_files (file_path, content_hash, batch_id, row_count)
+            VALUES (:file_path, :content_hash, :batch_id, :row_count)
+            ON CONFLICT (file_path) DO UPDATE SET
+                content_hash = EXCLUDED.content_hash,
+                batch_id = EXCLUDED.batch_id,
+                row_count = EXCLUDED.row_count,
+                ingested_at = NOW(),
+                loaded_at = NULL;
+        """), {'file_path': file_path, 'content_hash': content_hash, 'batch_id': batch_id, 'row_count': len(df)})
+
+    elapsed = time.perf_counter() - started
+    logger.info(
+        f"Ingested {file_path}: {len(df)} rows in {elapsed:.1f}s "
+        f"({len(df) / max(elapsed, 1e-6):,.0f} rows/s) — batch {batch_id}"
+    )
+    return len(df)
+
+def run_ingest_files(engine, paths, data_path, workers=None):
+    workers = min(workers or INGEST_WORKERS, len(paths))
+    logger.info(f"Ingesting {len(paths)} files with {workers} workers")
+
+    # No blanket TRUNCATE here: a skipped file may still be waiting in staging for transform/load.
+    # Only rows of files whose Silver batch has fully loaded to Gold are cleared.
+    with engine.begin() as conn:
+        pruned = conn.execute(text("""
+            DELETE FROM staging_online_retail.raw_transactions
+            WHERE batch_id IN (
+                SELECT batch_id FROM staging_online_retail.ingested_files WHERE loaded_at IS NOT NULL
+            )
+        """)).rowcount
+    logger.info(f"Pruned {pruned} staging rows from files already loaded to Gold")
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        row_counts = list(pool.map(lambda path: ingest_file(engine, path, file_key(path, data_path)), paths))
+
+    total = sum(row_counts)
+    logger.info(f"Ingested {total} rows from {len(paths)} files into staging_online_retail.raw_transactions")
+    return total
+
+def run_ingest():
+    logger.info("Starting ingestion...")
+
+    # Run schema.sql first — creates all schemas and tables if they don't exist.
+    # Using IF NOT EXISTS throughout so this is safe and idempotent on every run.
+    # pool_size matches INGEST_WORKERS so concurrent file loads never wait on a connection.
+    engine = create_engine(DATABASE_URL, pool_size=INGEST_WORKERS)
+    with engine.begin() as conn:
+        conn.execute(text(SCHEMA_FILE.read_text()))
+    logger.info("Schema initialised")
+
+    paths = resolve_data_files(DATA_PATH)
+    if is_multi_file(DATA_PATH):
+        if not paths:
+            raise FileNotFoundError(f"No CSV files match DATA_PATH={DATA_PATH}")
+        return run_ingest_files(engine, paths, DATA_PATH)
+
+    df = read_source_file(DATA_PATH, str(uuid.uuid4()))
 
     # TRUNCATE before load ensures idempotency: it's faster than DELETE and resets no identity.
     # Every run starts with a clean slate in the staging area.
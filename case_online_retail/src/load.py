@@ -3,16 +3,94 @@ from sqlalchemy import create_engine, text
 from dotenv import load_dotenv
 import os
 from common.logger import get_logger
+from case_online_retail.src.fingerprint import register_fingerprints
+from case_online_retail.src.transform import SILVER_TABLES
 
 load_dotenv()
 logger = get_logger("Online Retail")
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Rows per fact_sales transaction — each committed chunk is also one checkpoint row
+FACT_CHUNK_SIZE = 1000
+
 # Using a class (RetailLoader) instead of standalone functions provides single responsibility: 
 # each dim loader is independently testable and retryable on failure.
 class RetailLoader:
-    def __init__(self, engine):
+    def __init__(self, engine, batch_id=None):
         self.engine = engine
+        # Silver batch being loaded — checkpoints are only recorded when this is set
+        self.batch_id = batch_id
+
+    def get_latest_batch_id(self, conn):
+        return conn.execute(text(
+            "SELECT batch_id::text FROM silver_online_retail.batches ORDER BY published_at DESC LIMIT 1"
+        )).scalar()
+
+    def get_checkpoints(self, conn):
+        """Returns {step: [(chunk_start, chunk_end), ...]} of work already committed for this batch."""
+        checkpoints = {}
+        rows = conn.execute(text("""
+            SELECT step, chunk_start, chunk_end FROM dw_online_retail.load_checkpoints
+            WHERE batch_id = :batch_id ORDER BY step, chunk_start
+        """), {'batch_id': self.batch_id}).fetchall()
+        for step, chunk_start, chunk_end in rows:
+            checkpoints.setdefault(step, []).append((chunk_start, chunk_end))
+        return checkpoints
+
+    def mark_source_files_loaded(self):
+        # Only the ingest batches this Silver batch was built from (recorded at publish) — multi-file
+        # ingest prunes those files' staging rows next run, which is safe now that they are in Gold.
+        with self.engine.begin() as conn:
+            marked = conn.execute(text("""
+                UPDATE staging_online_retail.ingested_files SET loaded_at = NOW()
+                WHERE loaded_at IS NULL
+                  AND batch_id = ANY(
+                      SELECT unnest(source_batch_ids) FROM silver_online_retail.batches WHERE batch_id = :batch_id
+                  )
+            """), {'batch_id': self.batch_id}).rowcount
+        logger.info(f"Marked {marked} source files as loaded for batch {self.batch_id}")
+
+    def read_silver(self):
+        """
+        Reads the batch id, its checkpoints and the Silver rows still needed in one REPEATABLE READ
+        snapshot, so a transform publishing mid-read can't mix two batches under one batch_id.
+        Returns (checkpoints, df_facts, df_products, df_customers); frames are None when skipped.
+        """
+        with self.engine.connect().execution_options(isolation_level='REPEATABLE READ') as conn:
+            # LOCK before the first query: the snapshot is taken after it, and a concurrent
+            # shadow swap waits until this read finishes instead of replacing tables mid-read.
+            # Same order as the swap in write_to_silver (batches last), so the two can't deadlock.
+            tables = ', '.join(f"silver_online_retail.{t}" for t in [*SILVER_TABLES, 'batches'])
+            conn.execute(text(f"LOCK TABLE {tables} IN ACCESS SHARE MODE"))
+            if self.batch_id is None:
+                self.batch_id = self.get_latest_batch_id(conn)
+            if self.batch_id is None:
+                return {}, None, None, None
+            checkpoints = self.get_checkpoints(conn)
+
+            df_facts = pd.read_sql(text("""
+                SELECT * FROM silver_online_retail.transactions
+                WHERE batch_id = :batch_id ORDER BY row_ordinal
+            """), conn, params={'batch_id': self.batch_id})
+            # Dimension steps already committed for this batch skip their Silver reads
+            df_products = None
+            if 'dim_products' not in checkpoints:
+                df_products = pd.read_sql(text("SELECT * FROM silver_online_retail.products"), conn)
+            df_customers = None
+            if 'dim_customers' not in checkpoints:
+                df_customers = pd.read_sql(text("SELECT * FROM silver_online_retail.customers"), conn)
+        return checkpoints, df_facts, df_products, df_customers
+
+    # Checkpoint is written on the same connection as the data it describes,
+    # so a step is either committed and recorded, or neither.
+    def mark_committed(self, conn, step, chunk_start, chunk_end):
+        if self.batch_id is None:
+            return
+        conn.execute(text("""
+            INSERT INTO dw_online_retail.load_checkpoints (batch_id, step, chunk_start, chunk_end)
+            VALUES (:batch_id, :step, :chunk_start, :chunk_end)
+            ON CONFLICT (batch_id, step, chunk_start) DO NOTHING;
+        """), {'batch_id': self.batch_id, 'step': step, 'chunk_start': chunk_start, 'chunk_end': chunk_end})
 
     def load_dim_date(self, df_facts):
         logger.info("Loading dim_date...")
@@ -44,6 +122,7 @@ class RetailLoader:
                     ) ON CONFLICT (date_id) DO NOTHING;
                 """)
                 conn.execute(insert_stmt, row.to_dict())
+            self.mark_committed(conn, 'dim_date', 0, len(dim_date_df))
         logger.info(f"Loaded {len(dim_date_df)} dates into dim_date")
 
     def load_dim_products(self, df_products):
@@ -58,6 +137,7 @@ class RetailLoader:
                     ON CONFLICT (stock_code) DO UPDATE SET description = EXCLUDED.description;
                 """)
                 conn.execute(insert_stmt, row.to_dict())
+            self.mark_committed(conn, 'dim_products', 0, len(df_products))
         logger.info(f"Loaded {len(df_products)} products into dim_products")
 
     def load_dim_customers(self, df_customers):
@@ -70,6 +150,7 @@ class RetailLoader:
                     ON CONFLICT (raw_customer_id) DO UPDATE SET country = EXCLUDED.country;
                 """)
                 conn.execute(insert_stmt, row.to_dict())
+            self.mark_committed(conn, 'dim_customers', 0, len(df_customers))
         logger.info(f"Loaded {len(df_customers)} customers into dim_customers")
 
     def resolve_surrogate_keys(self, df_facts):
@@ -85,38 +166,76 @@ class RetailLoader:
         df_enriched = df_facts.merge(dim_products, on='stock_code', how='left')
         df_enriched = df_enriched.merge(dim_customers, on='raw_customer_id', how='left')
         
-        # Select final columns for fact_sales
-        df_final = df_enriched[['invoice_no', 'customer_id', 'product_id', 'date_id', 'quantity', 'unit_price', 'total_value']]
+        # Select final columns for fact_sales; row_ordinal addresses checkpointed chunks and
+        # row_fingerprint is registered when its chunk commits — both are dropped before insert
+        columns = ['invoice_no', 'customer_id', 'product_id', 'date_id', 'quantity', 'unit_price', 'total_value']
+        columns += [c for c in ['row_ordinal', 'row_fingerprint'] if c in df_enriched.columns]
+        df_final = df_enriched[columns]
         
         logger.info(f"Surrogate keys resolved. Enriched dataframe has {len(df_final)} rows")
         return df_final
 
-    def load_fact_sales(self, df_facts_enriched):
+    def load_fact_sales(self, df_facts_enriched, start_row=0):
         logger.info("Loading fact_sales...")
-        # Using chunksize=1000 on fact_sales: Inserting 534k rows at once risks memory pressure 
-        # and transaction timeouts. 1,000-row chunks are recoverable and observable.
-        df_facts_enriched.to_sql(
-            'fact_sales', 
-            self.engine, 
-            schema='dw_online_retail', 
-            if_exists='append', 
-            index=False,
-            method='multi',
-            chunksize=1000
-        )
-        logger.info(f"Loaded {len(df_facts_enriched)} facts into fact_sales")
+        if self.batch_id is not None:
+            df_facts_enriched = df_facts_enriched.assign(batch_id=self.batch_id)
+        if 'row_ordinal' not in df_facts_enriched.columns:
+            df_facts_enriched = df_facts_enriched.assign(row_ordinal=range(len(df_facts_enriched)))
+        if start_row:
+            logger.info(f"Resuming fact_sales at row {start_row} — {start_row} rows already committed")
+
+        # One transaction per 1,000-row chunk, committed together with its checkpoint:
+        # inserting 534k rows at once risks memory pressure and transaction timeouts,
+        # and a failed run can restart after the last committed chunk instead of from zero.
+        # Chunks are addressed by Silver row_ordinal (0..n-1), never by physical row position.
+        remaining = df_facts_enriched[df_facts_enriched['row_ordinal'] >= start_row]
+        loaded = 0
+        registered = 0
+        for offset in range(0, len(remaining), FACT_CHUNK_SIZE):
+            chunk = remaining.iloc[offset:offset + FACT_CHUNK_SIZE]
+            with self.engine.begin() as conn:
+                chunk.drop(columns=['row_ordinal', 'row_fingerprint'], errors='ignore').to_sql(
+                    'fact_sales',
+                    conn,
+                    schema='dw_online_retail',
+                    if_exists='append',
+                    index=False,
+                    method='multi'
+                )
+                self.mark_committed(
+                    conn, 'fact_sales', int(chunk['row_ordinal'].iloc[0]), int(chunk['row_ordinal'].iloc[-1]) + 1
+                )
+                # Same transaction as the facts: transform only skips rows that really are in Gold
+                if self.batch_id is not None and 'row_fingerprint' in chunk.columns:
+                    registered += register_fingerprints(conn, chunk['row_fingerprint'].dropna(), self.batch_id)
+            loaded += len(chunk)
+        logger.info(f"Loaded {loaded} facts into fact_sales ({registered} new row fingerprints registered)")
 
     def run_load(self):
         logger.info("Reading DataFrames from Silver Layer...")
-        df_products = pd.read_sql("SELECT * FROM silver_online_retail.products", self.engine)
-        df_customers = pd.read_sql("SELECT * FROM silver_online_retail.customers", self.engine)
-        df_facts = pd.read_sql("SELECT * FROM silver_online_retail.transactions", self.engine)
-
-        self.load_dim_date(df_facts)
-        self.load_dim_products(df_products)
-        self.load_dim_customers(df_customers)
-        df_facts_enriched = self.resolve_surrogate_keys(df_facts)
-        self.load_fact_sales(df_facts_enriched)
+        checkpoints, df_facts, df_products, df_customers = self.read_silver()
+        if df_facts is None:
+            logger.info("No Silver batch published yet — nothing to load")
+            return
+        logger.info(f"Loading Silver batch {self.batch_id} — completed steps: {sorted(checkpoints) or 'none'}")
+
+        # Dimension steps already committed for this batch are skipped
+        if 'dim_date' not in checkpoints:
+            self.load_dim_date(df_facts)
+        if df_products is not None:
+            self.load_dim_products(df_products)
+        if df_customers is not None:
+            self.load_dim_customers(df_customers)
+
+        # Chunks are committed in ordinal order, so the highest chunk_end is the resume point
+        start_row = max((end for _, end in checkpoints.get('fact_sales', [])), default=0)
+        if start_row >= len(df_facts):
+            logger.info(f"fact_sales already fully loaded for batch {self.batch_id} — nothing to do")
+        else:
+            df_facts_enriched = self.resolve_surrogate_keys(df_facts)
+            self.load_fact_sales(df_facts_enriched, start_row=start_row)
+        # Also reached on a retry after the last chunk committed, so the marking can't be skipped
+        self.mark_source_files_loaded()
 
 def run_load():
     engine = create_engine(DATABASE_URL)
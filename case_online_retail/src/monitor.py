@@ -2,14 +2,19 @@ from sqlalchemy import create_engine, text
 from dotenv import load_dotenv
 import os
 from common.logger import get_logger
+from case_online_retail.src.ingest import DATA_PATH, is_multi_file
 
 load_dotenv()
 logger = get_logger("Online Retail Monitor")
 DATABASE_URL = os.getenv("DATABASE_URL")
 
 # Known baseline from the UCI dataset.
-# Bronze → Silver expects ~7k row loss (dedup + bad price filter).
+# Bronze → Silver expects ~7k row loss on a first load (dedup + bad price filter).
 # Silver → Gold expects ~0 loss — load.py only resolves surrogate keys, no filtering.
+# Layers are compared per batch: Silver only holds the latest batch (staging rows not yet in Gold),
+# and Gold is cumulative, so the audit counts fact_sales rows carrying that batch_id.
+# EXPECTED_MIN_ROWS applies to the single-file UCI export only: in directory/glob mode each run
+# stages just the newly delivered files (loaded ones are pruned), so there is no fixed minimum.
 EXPECTED_MIN_ROWS = 500000
 MAX_SILVER_TO_GOLD_LOSS = 1000
 
@@ -26,26 +31,40 @@ def run_monitor():
             "SELECT COUNT(*) FROM staging_online_retail.raw_transactions"
         )).scalar()
 
+        batch = conn.execute(text("""
+            SELECT batch_id, source_rows, skipped_rows FROM silver_online_retail.batches
+            ORDER BY published_at DESC LIMIT 1
+        """)).fetchone()
+
+        if batch is None:
+            logger.error("ANOMALY: No Silver batch has been published. Pipeline failure suspected.")
+            return
+        batch_id, source_rows, skipped_rows = batch
+
+        # Staged rows as this batch's transform saw them — new plus already in Gold
+        staged_rows = source_rows + (skipped_rows or 0)
+        if not is_multi_file(DATA_PATH) and staged_rows < EXPECTED_MIN_ROWS:
+            logger.error(f"ANOMALY: Bronze had {staged_rows} rows for batch {batch_id} — below {EXPECTED_MIN_ROWS}. Incomplete ingest suspected.")
+
         silver_count = conn.execute(text(
-            "SELECT COUNT(*) FROM silver_online_retail.transactions"
-        )).scalar()
+            "SELECT COUNT(*) FROM silver_online_retail.transactions WHERE batch_id = :batch_id"
+        ), {'batch_id': batch_id}).scalar()
 
         gold_count = conn.execute(text(
-            "SELECT COUNT(*) FROM dw_online_retail.fact_sales"
-        )).scalar()
+            "SELECT COUNT(*) FROM dw_online_retail.fact_sales WHERE batch_id = :batch_id"
+        ), {'batch_id': batch_id}).scalar()
 
-        bronze_to_silver_loss = bronze_count - silver_count
+        bronze_to_silver_loss = source_rows - silver_count
         silver_to_gold_loss = silver_count - gold_count
 
-        logger.info(f"Pipeline audit — Bronze: {bronze_count} | Silver: {silver_count} | Gold: {gold_count}")
-        logger.info(f"Bronze → Silver loss = {bronze_to_silver_loss} rows (dedup + bad price filter, expected ~7k)")
+        logger.info(f"Pipeline audit for batch {batch_id}")
+        logger.info(f"Bronze: {bronze_count} staged | {skipped_rows} already in Gold | {source_rows} new")
+        logger.info(f"Batch — Bronze (new): {source_rows} | Silver: {silver_count} | Gold: {gold_count}")
+        logger.info(f"Bronze → Silver loss = {bronze_to_silver_loss} rows (dedup + bad price filter, expected ~7k on a first load)")
         logger.info(f"Silver → Gold loss   = {silver_to_gold_loss} rows (expected ~0)")
 
-        if bronze_count < EXPECTED_MIN_ROWS:
-            logger.error(f"ANOMALY: Bronze has {bronze_count} rows — below {EXPECTED_MIN_ROWS}. Incomplete ingest suspected.")
-
         if gold_count == 0:
-            logger.error("ANOMALY: fact_sales is empty. Pipeline failure suspected.")
+            logger.error(f"ANOMALY: fact_sales has no rows for batch {batch_id}. Pipeline failure suspected.")
 
         if bronze_to_silver_loss < 0:
             logger.error(f"ANOMALY: Silver has MORE rows than Bronze. Data integrity issue.")
@@ -0,0 +1,94 @@
+import os
+
+from sqlalchemy import create_engine
+from dotenv import load_dotenv
+
+from common.prepared import execute_prepared
+from common.query_service import CachedQueryService
+
+load_dotenv()
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+# --- analytical_queries.sql as prepared statements ($n = parameters) ---
+
+TOP_PRODUCTS_SQL = """
+    SELECT p.stock_code, p.description, SUM(f.total_value) AS total_revenue
+    FROM dw_online_retail.fact_sales f
+    JOIN dw_online_retail.dim_products p ON f.product_id = p.product_id
+    GROUP BY p.stock_code, p.description
+    ORDER BY total_revenue DESC
+    LIMIT $1
+"""
+
+MONTHLY_REVENUE_SQL = """
+    SELECT d.year, d.month, d.month_name, SUM(f.total_value) AS monthly_revenue
+    FROM dw_online_retail.fact_sales f
+    JOIN dw_online_retail.dim_date d ON f.date_id = d.date_id
+    WHERE ($1::int IS NULL OR d.year >= $1) AND ($2::int IS NULL OR d.year <= $2)
+    GROUP BY d.year, d.month, d.month_name
+    ORDER BY d.year ASC, d.month ASC
+"""
+
+REVENUE_BY_COUNTRY_SQL = """
+    SELECT c.country, SUM(f.total_value) AS country_revenue
+    FROM dw_online_retail.fact_sales f
+    JOIN dw_online_retail.dim_customers c ON f.customer_id = c.customer_id
+    GROUP BY c.country
+    ORDER BY country_revenue DESC
+"""
+
+TOP_CUSTOMERS_SQL = """
+    SELECT c.raw_customer_id, SUM(f.total_value) AS total_spend
+    FROM dw_online_retail.fact_sales f
+    JOIN dw_online_retail.dim_customers c ON f.customer_id = c.customer_id
+    WHERE c.raw_customer_id != 'UNKNOWN'
+    GROUP BY c.raw_customer_id
+    ORDER BY total_spend DESC
+    LIMIT $1
+"""
+
+SALES_VS_RETURNS_SQL = """
+    SELECT
+        SUM(CASE WHEN quantity > 0 THEN total_value ELSE 0 END) AS gross_sales,
+        SUM(CASE WHEN quantity < 0 THEN ABS(total_value) ELSE 0 END) AS total_returns,
+        SUM(total_value) AS net_revenue
+    FROM dw_online_retail.fact_sales
+"""
+
+# Cache version token: every committed load step — dim_products, dim_customers and each
+# fact_sales chunk — writes a load_checkpoints row (see load.py), so any Gold change moves it.
+RETAIL_VERSION_SQL = """
+    SELECT MAX(committed_at)::text AS version FROM dw_online_retail.load_checkpoints
+"""
+
+
+class RetailQueryService(CachedQueryService):
+    """
+    Dashboard reports from analytical_queries.sql as parameterised functions returning
+    pandas DataFrames, run as prepared statements and cached until the next Gold load.
+    """
+
+    def __init__(self, engine=None, cache=None):
+        super().__init__(cache)
+        self.engine = engine or create_engine(DATABASE_URL)
+
+    def version(self):
+        return execute_prepared(self.engine, 'qs_retail_version', RETAIL_VERSION_SQL).iloc[0, 0]
+
+    def _report(self, report, sql, params=()):
+        return self._cached(report, params, lambda: execute_prepared(self.engine, f"qs_{report}", sql, params))
+
+    def top_products_by_revenue(self, limit=10):
+        return self._report('top_products_by_revenue', TOP_PRODUCTS_SQL, (limit,))
+
+    def monthly_revenue(self, start_year=None, end_year=None):
+        return self._report('monthly_revenue', MONTHLY_REVENUE_SQL, (start_year, end_year))
+
+    def revenue_by_country(self):
+        return self._report('revenue_by_country', REVENUE_BY_COUNTRY_SQL)
+
+    def top_customers_by_spend(self, limit=10):
+        return self._report('top_customers_by_spend', TOP_CUSTOMERS_SQL, (limit,))
+
+    def sales_vs_returns(self):
+        return self._report('sales_vs_returns', SALES_VS_RETURNS_SQL)
@@ -1,103 +1,250 @@
 import pandas as pd
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from dotenv import load_dotenv
 import os
+import pathlib
+import re
+import uuid
+from concurrent.futures import ProcessPoolExecutor
 from common.logger import get_logger
+from case_online_retail.src.fingerprint import count_previously_ingested, read_new_staging_rows, fill_missing_fingerprints
 
 load_dotenv()
 logger = get_logger("Online Retail")
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-# if_exists='replace' on Silver: Idempotent. Silver is a transient cleaned layer, 
-# acceptable to drop and recreate on each run as it's not queried by analysts directly.
-def write_to_silver(df_products, df_customers, df_facts, engine):
+# TRANSFORM_WORKERS > 1 cleans staging rows on a process pool, sharded by TRANSFORM_SHARD_BY
+# ('invoice' = hash of invoice_no, 'month' = invoice_date month). 1 keeps the single-process path.
+TRANSFORM_WORKERS = int(os.getenv("TRANSFORM_WORKERS", "1"))
+TRANSFORM_SHARD_BY = os.getenv("TRANSFORM_SHARD_BY", "invoice")
+
+SCHEMA_FILE = pathlib.Path(__file__).resolve().parents[1] / "sql" / "schema.sql"
+# Silver tables published by shadow swap, in swap order; batches is append-only and not swapped
+SWAPPED_SILVER_TABLES = ('products', 'customers', 'transactions')
+
+def load_silver_tables(schema_file=SCHEMA_FILE):
+    """
+    Reads the Silver DDL from schema.sql, the single source of truth, as {table: (columns_ddl, key)}.
+    The inline PRIMARY KEY is split off so shadows get it only after the bulk load — one index build
+    instead of per-row maintenance. Shadows are created from this DDL rather than LIKE the live table,
+    so tables an older to_sql(if_exists='replace') left with pandas-inferred TEXT/BIGINT/FLOAT types
+    are replaced by the declared ones on the next publish.
+    """
+    sql = pathlib.Path(schema_file).read_text()
+    bodies = dict(re.findall(r"CREATE TABLE IF NOT EXISTS silver_online_retail\.(\w+) \((.*?)\n\);", sql, re.S))
+    tables = {}
+    for table in SWAPPED_SILVER_TABLES:
+        columns, key = [], None
+        for line in bodies[table].strip().splitlines():
+            column = line.split('--')[0].strip().rstrip(',').strip()
+            if column.endswith('PRIMARY KEY'):
+                key = column.split()[0]
+                column = column[:-len('PRIMARY KEY')].rstrip() + ' NOT NULL'
+            columns.append(column)
+        if key is None:
+            raise ValueError(f"silver_online_retail.{table} in {schema_file} declares no PRIMARY KEY")
+        tables[table] = (',\n'.join(columns), key)
+    return tables
+
+SILVER_TABLES = load_silver_tables()
+
+# Shadow-table swap instead of to_sql(if_exists='replace'): replace drops the table and recreates it
+# with pandas-inferred types, losing the primary keys from schema.sql, and readers see missing or
+# half-written tables meanwhile. Loading into shadows built from the declared schema and renaming
+# all three inside one transaction means load.py and analysts only ever see a complete Silver layer.
+def write_to_silver(df_products, df_customers, df_facts, engine, source_rows=None, skipped_rows=None, source_batch_ids=()):
     logger.info("Writing cleaned DataFrames to Silver Layer...")
+    batch_id = str(uuid.uuid4())
+    # batch_id + row_ordinal travel with every Silver fact: load.py reads exactly this batch
+    # and checkpoints chunks by ordinal, independent of physical row order.
+    df_facts = df_facts.assign(batch_id=batch_id, row_ordinal=range(len(df_facts)))
+    frames = {'products': df_products, 'customers': df_customers, 'transactions': df_facts}
 
-    # Write to products
-    df_products.to_sql(
-        'products', engine, schema='silver_online_retail', 
-        if_exists='replace', index=False
-    )
-    
-    # Write to customers
-    df_customers.to_sql(
-        'customers', engine, schema='silver_online_retail', 
-        if_exists='replace', index=False
-    )
-    
-    # Write to transactions (facts with natural keys)
-    df_facts.to_sql(
-        'transactions', engine, schema='silver_online_retail', 
-        if_exists='replace', index=False
-    )
-    logger.info("Silver Layer load completed successfully.")
+    with engine.begin() as conn:
+        # Bulk-load shadows first — live tables are not locked while this runs
+        for table, (columns, key) in SILVER_TABLES.items():
+            shadow = f"{table}_shadow"
+            conn.execute(text(f"DROP TABLE IF EXISTS silver_online_retail.{shadow}"))
+            conn.execute(text(f"CREATE TABLE silver_online_retail.{shadow} ({columns})"))
+            frames[table].to_sql(
+                shadow, conn, schema='silver_online_retail',
+                if_exists='append', index=False, method='multi', chunksize=1000
+            )
+            conn.execute(text(
+                f"ALTER TABLE silver_online_retail.{shadow} "
+                f"ADD CONSTRAINT {shadow}_pkey PRIMARY KEY ({key})"
+            ))
+            logger.info(f"Loaded {len(frames[table])} rows into silver_online_retail.{shadow}")
+
+        # Swap all three in together: exclusive locks are only held from here until commit
+        for table in SILVER_TABLES:
+            shadow = f"{table}_shadow"
+            conn.execute(text(f"DROP TABLE IF EXISTS silver_online_retail.{table}"))
+            conn.execute(text(f"ALTER TABLE silver_online_retail.{shadow} RENAME TO {table}"))
+            conn.execute(text(
+                f"ALTER TABLE silver_online_retail.{table} "
+                f"RENAME CONSTRAINT {shadow}_pkey TO {table}_pkey"
+            ))
+
+        # Registered in the swap transaction so a batch_id always matches the Silver rows it names.
+        # source_rows / skipped_rows let monitor.py audit this batch rather than all history.
+        # source_batch_ids are the ingest batches (one per file) this transform actually read —
+        # load.py marks exactly those files loaded once the batch is in Gold.
+        conn.execute(text("""
+            INSERT INTO silver_online_retail.batches (batch_id, source_rows, skipped_rows, source_batch_ids)
+            VALUES (:batch_id, :source_rows, :skipped_rows, CAST(:source_batch_ids AS UUID[]))
+        """), {
+            'batch_id': batch_id, 'source_rows': source_rows, 'skipped_rows': skipped_rows,
+            'source_batch_ids': [str(b) for b in source_batch_ids]
+        })
+    logger.info(f"Silver Layer load completed successfully. batch_id={batch_id}")
+    return batch_id
+
+# Cleaning rules for one set of staging rows. Pure function of its input so it can run on a
+# process pool shard as-is; returns the counts instead of logging them so shards can be summed.
+def clean_transactions(df):
+    stats = {}
 
-def run_transform():
-    logger.info("Starting transformation process")
-    # create_engine inside function: If DATABASE_URL is None, module-level fails at import; 
-    # inside function fails at call time — much easier to debug.
-    engine = create_engine(DATABASE_URL)
-    df = pd.read_sql("SELECT * FROM staging_online_retail.raw_transactions", engine)
-    
     # capture initial_count
     initial_count = len(df)
-    
-    # drop_duplicates() on all columns: Subset subset=['invoice_no','stock_code'] would remove 
+
+    # Exact duplicates only: Subset subset=['invoice_no','stock_code'] would remove 
     # ~10k rows; same product can legitimately appear twice on same invoice (e.g., separate order lines).
-    df = df.drop_duplicates()
-    duplicates_count = initial_count - len(df)
-    logger.info(f"Dropped {duplicates_count} duplicate rows")
-    
-    # dropna(subset=['invoice_no', 'stock_code', 'unit_price']) — log how many dropped
+    # row_fingerprint hashes all source columns at ingest, so deduping on it alone matches
+    # drop_duplicates() on all columns; frames without it fall back to the full-column compare.
+    # NULLs would all compare equal and collapse distinct rows — run_transform fills them first.
+    if 'row_fingerprint' in df.columns and df['row_fingerprint'].isna().any():
+        raise ValueError("row_fingerprint has NULLs — run fill_missing_fingerprints before cleaning")
+    df = df.drop_duplicates(subset=['row_fingerprint'] if 'row_fingerprint' in df.columns else None)
+    stats['duplicates'] = initial_count - len(df)
+
+    # dropna(subset=['invoice_no', 'stock_code', 'unit_price']) — count how many dropped
     count_before_dropna = len(df)
     df = df.dropna(subset=['invoice_no', 'stock_code', 'unit_price'])
-    dropna_count = count_before_dropna - len(df)
-    logger.info(f"Dropped {dropna_count} rows with null mandatory fields (invoice_no, stock_code, unit_price)")
-    
+    stats['dropna'] = count_before_dropna - len(df)
+
     # Fill customer_id nulls with 'UNKNOWN' instead of dropping: 135k rows represent real revenue. 
     # Dropping loses business data; sentinel preserves FK integrity in the DW.
-    customer_id_nulls = df['customer_id'].isnull().sum()
+    stats['customer_id_nulls'] = int(df['customer_id'].isnull().sum())
     df['customer_id'] = df['customer_id'].fillna('UNKNOWN')
-    logger.info(f"Filled {customer_id_nulls} null customer_id values with 'UNKNOWN'")
-    
-    # fill description nulls AND empty strings — log count
+
+    # fill description nulls AND empty strings — count them
     desc_to_fill = df['description'].isnull() | (df['description'].str.strip() == '')
-    desc_fill_count = desc_to_fill.sum()
+    stats['desc_fill'] = int(desc_to_fill.sum())
     df.loc[desc_to_fill, 'description'] = 'NO DESCRIPTION'
-    logger.info(f"Filled {desc_fill_count} null or empty description values with 'NO DESCRIPTION'")
-    
+
     # strip whitespace from string columns
     df = df.apply(lambda x: x.str.strip() if x.dtype == "object" else x)
-    logger.info("Stripped whitespace from all string columns")
 
     # a) Cast invoice_date
     df['invoice_date'] = pd.to_datetime(df['invoice_date'])
-    logger.info("Casted invoice_date to datetime")
 
     # b) Derive date_id (YYYYMMDD integer)
     df['date_id'] = df['invoice_date'].dt.strftime('%Y%m%d').astype(int)
-    logger.info(f"Derived date_id in YYYYMMDD format")
 
     # Filter unit_price <= 0 but keep negative quantity: 
     # Bad price = data error; negative quantity = valid return/cancellation event.
-    bad_price_count = (df['unit_price'] <= 0).sum()
+    stats['bad_price'] = int((df['unit_price'] <= 0).sum())
     df = df[df['unit_price'] > 0]
-    logger.info(f"Dropped {bad_price_count} rows with unit_price <= 0")
 
     # d) Compute total_value
     df['total_value'] = df['quantity'] * df['unit_price']
+
+    return df, stats
+
+def parse_invoice_dates(dates):
+    # Parse each distinct timestamp string once (~23k distinct vs 541k rows) and map back.
+    # factorize keeps first-appearance order, so format inference sees the same first value.
+    codes, uniques = pd.factorize(dates)
+    parsed = pd.to_datetime(pd.Series(uniques, dtype=object)).to_numpy()
+    values = parsed.take(codes, mode='clip')
+    return pd.Series(values, index=dates.index).where(codes >= 0)
+
+# Shard keys keep every exact duplicate in one shard (duplicates share invoice_no and invoice_date),
+# so per-shard drop_duplicates() gives the same result as one pass over the full frame.
+def shard_transactions(df, num_shards, shard_by='invoice'):
+    if shard_by == 'month':
+        # Month sharding needs parsed dates: parse here once and hand the parsed column to the
+        # workers, whose pd.to_datetime() is then a no-op instead of a second full parse.
+        df = df.assign(invoice_date=parse_invoice_dates(df['invoice_date']))
+        months = df['invoice_date'].dt.to_period('M')
+        keys = pd.Series(months.factorize()[0], index=df.index) % num_shards
+    elif shard_by == 'invoice':
+        keys = pd.util.hash_pandas_object(df['invoice_no'], index=False) % num_shards
+    else:
+        raise ValueError(f"Unknown shard_by '{shard_by}' — expected 'invoice' or 'month'")
+    return [shard for _, shard in df.groupby(keys.values, sort=False)]
+
+def clean_transactions_parallel(df, workers, shard_by='invoice'):
+    shards = shard_transactions(df, workers, shard_by) if len(df) else []
+    # Nothing to fan out (e.g. every staging row was already published) — the serial path
+    # handles empty frames and returns the zero counts run_transform logs.
+    if not shards:
+        return clean_transactions(df)
+    logger.info(f"Cleaning {len(df)} rows as {len(shards)} '{shard_by}' shards on {workers} processes")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(clean_transactions, shards))
+
+    # Shards keep the staging index, so sorting restores the serial row order and the
+    # first-occurrence drop_duplicates(subset=...) on the dimensions picks the same rows.
+    df = pd.concat([shard for shard, _ in results]).sort_index()
+    stats = {key: sum(shard_stats[key] for _, shard_stats in results) for key in results[0][1]}
+    return df, stats
+
+def run_transform(workers=None, shard_by=None):
+    logger.info("Starting transformation process")
+    # create_engine inside function: If DATABASE_URL is None, module-level fails at import; 
+    # inside function fails at call time — much easier to debug.
+    engine = create_engine(DATABASE_URL)
+    # Rows whose fingerprint is already in the store were published by an earlier batch
+    previously_ingested = count_previously_ingested(engine)
+    df = read_new_staging_rows(engine)
+    df, backfilled_known = fill_missing_fingerprints(engine, df)
+    previously_ingested += backfilled_known
+    source_rows = len(df)
+    source_batch_ids = df['batch_id'].dropna().unique().tolist()
+    logger.info(f"Skipped {previously_ingested} rows already loaded to Gold by earlier batches")
+    # Nothing new (e.g. the daily re-ingest of an unchanged export): keep the current Silver batch
+    # instead of publishing an empty one over it.
+    if source_rows == 0:
+        logger.info("No new staging rows — Silver left unchanged")
+        return
+
+    workers = workers or TRANSFORM_WORKERS
+    shard_by = shard_by or TRANSFORM_SHARD_BY
+    if workers > 1:
+        df, stats = clean_transactions_parallel(df, workers, shard_by)
+    else:
+        df, stats = clean_transactions(df)
+
+    logger.info(f"Dropped {stats['duplicates']} duplicate rows")
+    logger.info(f"Dropped {stats['dropna']} rows with null mandatory fields (invoice_no, stock_code, unit_price)")
+    logger.info(f"Filled {stats['customer_id_nulls']} null customer_id values with 'UNKNOWN'")
+    logger.info(f"Filled {stats['desc_fill']} null or empty description values with 'NO DESCRIPTION'")
+    logger.info("Stripped whitespace from all string columns")
+    logger.info("Casted invoice_date to datetime")
+    logger.info(f"Derived date_id in YYYYMMDD format")
+    logger.info(f"Dropped {stats['bad_price']} rows with unit_price <= 0")
     logger.info("Computed total_value (quantity * unit_price)")
 
+    if df.empty:
+        logger.info("No rows left after cleaning — Silver left unchanged")
+        return
+
     # building dimension tables
     df_products = df[['stock_code', 'description']].drop_duplicates(subset=['stock_code'])
     df_customers = df[['customer_id', 'country']].drop_duplicates(subset=['customer_id']).rename(columns={'customer_id': 'raw_customer_id'})
     # renamed customer_id to raw_customer_id in df_facts
-    df_facts = df[['invoice_no', 'stock_code', 'customer_id', 'date_id', 'quantity', 'unit_price', 'total_value']].rename(columns={'customer_id': 'raw_customer_id'})
+    # row_fingerprint is carried to Silver so load.py can register each row once it is in fact_sales
+    df_facts = df[['invoice_no', 'stock_code', 'customer_id', 'date_id', 'quantity', 'unit_price', 'total_value', 'row_fingerprint']].rename(columns={'customer_id': 'raw_customer_id'})
 
     # Write cleaned DataFrames to Silver layer
-    write_to_silver(df_products, df_customers, df_facts, engine)
+    write_to_silver(
+        df_products, df_customers, df_facts, engine,
+        source_rows=source_rows, skipped_rows=previously_ingested, source_batch_ids=source_batch_ids
+    )
 
     
 if __name__ == '__main__':
     run_transform()
-    logger.info("Transform completed successfully")
\ No newline at end of file
+    logger.info("Transform completed successfully")
@@ -102,3 +102,176 @@ def test_date_id_derivation():
         _, _, df_facts = run_transform()
         # '2010-12-01' -> 20101201
         assert df_facts.iloc[0]['date_id'] == 20101201
+
+def test_silver_swap_after_shadow_load():
+    # Test 6 — Live Silver tables are only dropped once all three shadows are loaded
+    from unittest.mock import MagicMock
+    from case_online_retail.src.transform import write_to_silver
+
+    engine = MagicMock()
+    conn = engine.begin.return_value.__enter__.return_value
+    df = pd.DataFrame({'stock_code': ['A']})
+
+    with patch('pandas.DataFrame.to_sql') as mock_to_sql:
+        write_to_silver(df, df, df, engine)
+
+    statements = [str(c.args[0]) for c in conn.execute.call_args_list]
+    first_swap = statements.index("DROP TABLE IF EXISTS silver_online_retail.products")
+    assert mock_to_sql.call_count == 3
+    assert all('CREATE TABLE' not in s for s in statements[first_swap:])
+    # Shadows use the declared types, not a copy of whatever the live table happens to be
+    assert any('CREATE TABLE silver_online_retail.transactions_shadow' in s and 'NUMERIC(12,2)' in s
+               for s in statements[:first_swap])
+    assert "ALTER TABLE silver_online_retail.transactions_shadow RENAME TO transactions" in statements
+    engine.begin.assert_called_once()
+
+def test_load_resumes_after_last_checkpoint():
+    # Test 7 — A retried load skips committed dims and restarts facts after the last committed chunk
+    from unittest.mock import MagicMock
+    from case_online_retail.src.load import RetailLoader
+
+    engine = MagicMock()
+    loader = RetailLoader(engine, batch_id='b1')
+    df_facts = pd.DataFrame({
+        'invoice_no': [str(i) for i in range(2500)], 'row_ordinal': range(2500), 'row_fingerprint': range(2500)
+    })
+    checkpoints = {
+        'dim_date': [(0, 1)], 'dim_products': [(0, 1)], 'dim_customers': [(0, 1)],
+        'fact_sales': [(0, 1000), (1000, 2000)],
+    }
+
+    with patch.object(RetailLoader, 'read_silver', return_value=(checkpoints, df_facts, None, None)), \
+         patch.object(RetailLoader, 'load_dim_date') as mock_dim_date, \
+         patch.object(RetailLoader, 'load_dim_products') as mock_dim_products, \
+         patch.object(RetailLoader, 'resolve_surrogate_keys', side_effect=lambda df: df), \
+         patch('case_online_retail.src.load.register_fingerprints', return_value=500) as mock_register, \
+         patch.object(RetailLoader, 'mark_source_files_loaded') as mock_mark_loaded, \
+         patch('pandas.DataFrame.to_sql') as mock_to_sql:
+        loader.run_load()
+
+    mock_dim_date.assert_not_called()
+    mock_dim_products.assert_not_called()
+    # Only ordinals 2000..2499 are written, as one chunk with its checkpoint
+    assert mock_to_sql.call_count == 1
+    conn = engine.begin.return_value.__enter__.return_value
+    assert conn.execute.call_args.args[1]['chunk_start'] == 2000
+    assert conn.execute.call_args.args[1]['chunk_end'] == 2500
+    # Fingerprints are registered with the chunk that committed them, not at Silver publish
+    assert list(mock_register.call_args.args[1]) == list(range(2000, 2500))
+    mock_mark_loaded.assert_called_once()
+
+def test_parallel_clean_matches_serial():
+    # Test 8 — Sharded cleaning on a process pool gives the same rows and counts as one pass
+    from case_online_retail.src.transform import clean_transactions, clean_transactions_parallel
+    data = {
+        'invoice_no': ['1', '1', '2', '3', '4', '4'],
+        'stock_code': ['A', 'A', 'B', 'A', 'C', 'C'],
+        'unit_price': [1.0, 1.0, 2.0, 0, 3.0, 3.0],
+        'quantity': [1, 1, 2, 1, -1, 5],
+        'customer_id': ['C1', 'C1', None, 'C3', 'C4', 'C4'],
+        'description': ['D1', 'D1', ' ', 'D3', 'D4', 'D4'],
+        'invoice_date': ['2010-12-01', '2010-12-01', '2011-01-05', '2011-01-05', '2011-02-01', '2011-02-01'],
+        'country': ['UK', 'UK', 'FR', 'UK', 'DE', 'DE']
+    }
+    df_input = pd.DataFrame(data)
+
+    df_serial, stats_serial = clean_transactions(df_input.copy())
+    for shard_by in ['invoice', 'month']:
+        df_parallel, stats_parallel = clean_transactions_parallel(df_input.copy(), 3, shard_by)
+        pd.testing.assert_frame_equal(df_parallel, df_serial)
+        assert stats_parallel == stats_serial
+
+    # Empty staging (everything already published) falls back to the serial path
+    df_empty, stats_empty = clean_transactions_parallel(df_input.iloc[0:0].copy(), 3, 'month')
+    assert len(df_empty) == 0 and stats_empty['duplicates'] == 0
+
+def test_row_fingerprint_ignores_pipeline_metadata():
+    # Test 9 — Same source row in two batches gets one fingerprint; different rows do not collide
+    from case_online_retail.src.fingerprint import compute_row_fingerprints
+    data = {
+        'invoice_no': ['1', '1', '2'],
+        'stock_code': ['A', 'A', 'A'],
+        'description': ['D1', 'D1', 'D1'],
+        'quantity': [1, 1, 1],
+        'invoice_date': ['2010-12-01', '2010-12-01', '2010-12-01'],
+        'unit_price': [1.0, 1.0, 1.0],
+        'customer_id': ['C1', 'C1', 'C1'],
+        'country': ['UK', 'UK', 'UK'],
+        'batch_id': ['b1', 'b2', 'b1']
+    }
+    fingerprints = compute_row_fingerprints(pd.DataFrame(data))
+    assert fingerprints.dtype == 'int64'
+    assert fingerprints[0] == fingerprints[1]
+    assert fingerprints[0] != fingerprints[2]
+
+def test_redelivered_file_is_skipped(tmp_path):
+    # Test 10 — Directory DATA_PATH expands to its CSVs; a file with unchanged content is not reloaded
+    from unittest.mock import MagicMock
+    from case_online_retail.src.ingest import resolve_data_files, file_key, file_content_hash, ingest_file
+
+    for name in ['uk.csv', 'fr.csv']:
+        (tmp_path / name).write_text('InvoiceNo,StockCode\n1,A\n')
+    (tmp_path / 'notes.txt').write_text('ignored')
+    paths = resolve_data_files(str(tmp_path))
+    assert [p.split('/')[-1] for p in paths] == ['fr.csv', 'uk.csv']
+
+    # Same basename in different folders must not share a registry key
+    for region in ['r1', 'r2']:
+        (tmp_path / region).mkdir()
+        (tmp_path / region / 'orders.csv').write_text('InvoiceNo,StockCode\n1,A\n')
+    pattern = str(tmp_path / '*' / 'orders.csv')
+    assert [file_key(p, pattern) for p in resolve_data_files(pattern)] == ['r1/orders.csv', 'r2/orders.csv']
+
+    engine = MagicMock()
+    conn = engine.connect.return_value.__enter__.return_value
+    conn.execute.return_value.fetchone.return_value = (file_content_hash(paths[0]), 'b1')
+
+    assert ingest_file(engine, paths[0], 'fr.csv') == 0
+    engine.begin.assert_not_called()
+
+def test_row_fingerprint_stable_across_inferred_dtypes():
+    # Test 11 — The same CSV line fingerprints identically whether CustomerID was read as int, float or text
+    from case_online_retail.src.fingerprint import compute_row_fingerprints
+    row = {
+        'invoice_no': '536365', 'stock_code': '85123A', 'description': 'WHITE HANGING',
+        'quantity': 6, 'invoice_date': '12/1/2010 8:26', 'unit_price': 2.55, 'country': 'United Kingdom'
+    }
+    as_int = pd.DataFrame([{**row, 'customer_id': 17850}, {**row, 'customer_id': 17851}])
+    as_float = pd.DataFrame([{**row, 'customer_id': 17850.0}, {**row, 'customer_id': None}])
+    as_text = pd.DataFrame([{**row, 'customer_id': '17850'}, {**row, 'customer_id': 'ABC'}])
+    fingerprints = {compute_row_fingerprints(df)[0] for df in [as_int, as_float, as_text]}
+    assert len(fingerprints) == 1
+
+def test_row_fingerprint_keeps_text_columns_distinct():
+    # Test 12 — Text columns are hashed as-is: stock codes '01', '1' and '1.0' are different rows
+    from case_online_retail.src.fingerprint import compute_row_fingerprints
+    row = {
+        'invoice_no': '536365', 'description': 'WHITE HANGING', 'quantity': 6, 'invoice_date': '12/1/2010 8:26',
+        'unit_price': 2.55, 'customer_id': 17850, 'country': 'United Kingdom'
+    }
+    df = pd.DataFrame([{**row, 'stock_code': code} for code in ['01', '1', '1.0']])
+    assert compute_row_fingerprints(df).nunique() == 3
+
+def test_missing_fingerprints_filled_before_dedup():
+    # Test 13 — Staging rows without a fingerprint get their own instead of collapsing into one NULL key
+    from unittest.mock import MagicMock
+    from case_online_retail.src.fingerprint import fill_missing_fingerprints, compute_row_fingerprints
+    from case_online_retail.src.transform import clean_transactions
+    df = pd.DataFrame({
+        'invoice_no': ['1', '2', '3'], 'stock_code': ['A', 'B', 'C'], 'description': ['D1', 'D2', 'D3'],
+        'quantity': [1, 2, 3], 'invoice_date': ['2010-12-01'] * 3, 'unit_price': [1.0, 2.0, 3.0],
+        'customer_id': ['C1', 'C2', 'C3'], 'country': ['UK'] * 3,
+    })
+    df['row_fingerprint'] = pd.array([None] * 3, dtype='Int64')
+
+    with pytest.raises(ValueError):
+        clean_transactions(df.copy())
+
+    engine = MagicMock()
+    # The third row's fingerprint is already registered, i.e. that row is in Gold
+    known = int(compute_row_fingerprints(df.iloc[[2]]).iloc[0])
+    engine.connect.return_value.__enter__.return_value.execute.return_value = [(known,)]
+    filled, already_loaded = fill_missing_fingerprints(engine, df)
+    assert already_loaded == 1
+    assert filled['invoice_no'].tolist() == ['1', '2']
+    assert filled['row_fingerprint'].notna().all() and filled['row_fingerprint'].nunique() == 2
@@ -0,0 +1,8 @@
+-- Load marker: one row per generator run, written to every shard once its load completes.
+-- Cache version token for the query service — shipment_ids repeat after RESTART IDENTITY.
+-- Kept out of schema.sql, which is not re-runnable: setup_schema.py and every generator run
+-- apply this file, so databases created before load_runs existed pick it up too.
+CREATE TABLE IF NOT EXISTS supply_chain.load_runs (
+    load_id UUID PRIMARY KEY,
+    loaded_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
@@ -1,10 +1,12 @@
+import uuid
 import pandas as pd
 import numpy as np
 from faker import Faker
 from sqlalchemy import text
 from datetime import datetime, timedelta, date
-from common.db_config import engine
 from common.logger import get_logger  # This triggers the basicConfig in common/logger.py
+from case_supply_chain.src.sharding import ShardRouter
+from case_supply_chain.src.setup_schema import run_load_runs
 
 logger = get_logger("Supply Chain")
 
@@ -12,13 +14,47 @@ fake = Faker()
 
 
 class SupplyChainGenerator:
-    def __init__(self, num_products=50, num_suppliers=20, num_warehouses=10, num_orders=500, num_shipments=1000):
+    def __init__(self, num_products=50, num_suppliers=20, num_warehouses=10, num_orders=500, num_shipments=1000, router=None):
         self.num_products = num_products
         self.num_suppliers = num_suppliers
         self.num_warehouses = num_warehouses
         self.num_orders = num_orders
         self.num_shipments = num_shipments
         self.schema = "supply_chain"
+        # One shard unless SUPPLY_CHAIN_SHARD_URLS lists several databases
+        self.router = router or ShardRouter.from_env()
+
+    def replicate(self, df, table, id_col=None):
+        """Writes a small dimension to every shard so fact joins stay shard-local."""
+        for shard_engine in self.router.engines:
+            df.to_sql(table, shard_engine, schema=self.schema, if_exists='append', index=False)
+            if id_col:
+                self.sync_sequence(shard_engine, table, id_col)
+
+    def route(self, df, table, id_col):
+        """Writes each row only to the shard that owns its order_id."""
+        for shard, part in self.router.split(df).items():
+            shard_engine = self.router.engines[shard]
+            part.to_sql(table, shard_engine, schema=self.schema, if_exists='append', index=False)
+            self.sync_sequence(shard_engine, table, id_col)
+            logger.info(f"Routed {len(part)} {table} rows to shard {shard}")
+
+    def sync_sequence(self, shard_engine, table, id_col):
+        # IDs are assigned in Python so they are global across shards — move the SERIAL past them
+        with shard_engine.begin() as conn:
+            conn.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{self.schema}.{table}', '{id_col}'), "
+                f"(SELECT COALESCE(MAX({id_col}), 0) + 1 FROM {self.schema}.{table}), false)"
+            ))
+
+    def record_load(self):
+        """Writes the same load_id to every shard; readers use it to spot a new load."""
+        load_id = str(uuid.uuid4())
+        run_load_runs(self.router)
+        for shard_engine in self.router.engines:
+            with shard_engine.begin() as conn:
+                conn.execute(text(f"INSERT INTO {self.schema}.load_runs (load_id) VALUES (:load_id)"), {'load_id': load_id})
+        logger.info(f"Recorded load {load_id} on {self.router.num_shards} shard(s).")
 
     def truncate_tables(self):
         """Clears all tables before generating data."""
@@ -26,10 +62,11 @@ class SupplyChainGenerator:
             'fact_shipments', 'dim_orders', 'dim_warehouses',
             'dim_suppliers', 'dim_products', 'dim_time'
         ]
-        with engine.begin() as conn:
-            for table in tables:
-                conn.execute(text(f"TRUNCATE TABLE {self.schema}.{table} RESTART IDENTITY CASCADE;"))
-        logger.info("All tables truncated and identities reset.")
+        for shard_engine in self.router.engines:
+            with shard_engine.begin() as conn:
+                for table in tables:
+                    conn.execute(text(f"TRUNCATE TABLE {self.schema}.{table} RESTART IDENTITY CASCADE;"))
+        logger.info(f"All tables truncated and identities reset on {self.router.num_shards} shard(s).")
 
     def generate_time_dimension(self, start_date="2024-01-01", end_date="2025-12-31"):
         """Populates the dim_time table for a given range."""
@@ -47,15 +84,16 @@ class SupplyChainGenerator:
             'day_name': dates.day_name(),
             'is_weekend': dates.dayofweek >= 5
         })
-        df.to_sql('dim_time', engine, schema=self.schema, if_exists='append', index=False)
+        self.replicate(df, 'dim_time')
         return df
 
     def generate_products(self):
         logger.info(f"Generating {self.num_products} products")
         categories = ['Electronics', 'Automotive', 'Industrial', 'Retail', 'Apparel']
         products = []
-        for _ in range(self.num_products):
+        for product_id in range(1, self.num_products + 1):
             products.append({
+                'product_id': product_id,
                 'product_name': fake.catch_phrase(),
                 'product_category': np.random.choice(categories),
                 'sku': fake.unique.bothify(text='SKU-####-????'),
@@ -63,14 +101,15 @@ class SupplyChainGenerator:
                 'description': fake.sentence()
             })
         df = pd.DataFrame(products)
-        df.to_sql('dim_products', engine, schema=self.schema, if_exists='append', index=False)
-        return pd.read_sql(f"SELECT product_id, unit_price FROM {self.schema}.dim_products", engine)
+        self.replicate(df, 'dim_products', 'product_id')
+        return df[['product_id', 'unit_price']]
 
     def generate_suppliers(self):
         logger.info(f"Generating {self.num_suppliers} suppliers")
         suppliers = []
-        for _ in range(self.num_suppliers):
+        for supplier_id in range(1, self.num_suppliers + 1):
             suppliers.append({
+                'supplier_id': supplier_id,
                 'supplier_name': fake.company(),
                 'supplier_country': fake.country(),
                 'contact_email': fake.company_email(),
@@ -78,14 +117,15 @@ class SupplyChainGenerator:
                 'rating': round(np.random.uniform(1, 5), 1)
             })
         df = pd.DataFrame(suppliers)
-        df.to_sql('dim_suppliers', engine, schema=self.schema, if_exists='append', index=False)
-        return pd.read_sql(f"SELECT supplier_id FROM {self.schema}.dim_suppliers", engine)
+        self.replicate(df, 'dim_suppliers', 'supplier_id')
+        return df[['supplier_id']]
 
     def generate_warehouses(self):
         logger.info(f"Generating {self.num_warehouses} warehouses")
         warehouses = []
-        for _ in range(self.num_warehouses):
+        for warehouse_id in range(1, self.num_warehouses + 1):
             warehouses.append({
+                'warehouse_id': warehouse_id,
                 'warehouse_name': f"WH-{fake.city()}",
                 'warehouse_location': fake.address().replace('\n', ', '),
                 'warehouse_country': fake.country(),
@@ -93,8 +133,8 @@ class SupplyChainGenerator:
                 'manager_name': fake.name()
             })
         df = pd.DataFrame(warehouses)
-        df.to_sql('dim_warehouses', engine, schema=self.schema, if_exists='append', index=False)
-        return pd.read_sql(f"SELECT warehouse_id FROM {self.schema}.dim_warehouses", engine)
+        self.replicate(df, 'dim_warehouses', 'warehouse_id')
+        return df[['warehouse_id']]
 
     def generate_orders(self):
         logger.info(f"Generating {self.num_orders} orders")
@@ -106,21 +146,22 @@ class SupplyChainGenerator:
         start_date = date(2024, 1, 1)
         end_date = date(2025, 12, 21)
         
-        for _ in range(self.num_orders):
+        for order_id in range(1, self.num_orders + 1):
             orders.append({
+                'order_id': order_id,
                 'order_date': fake.date_between(start_date=start_date, end_date=end_date),
                 'customer_id': fake.bothify(text='CUST-####'),
                 'order_status': np.random.choice(statuses, p=[0.8, 0.15, 0.05]),
                 'order_priority': np.random.choice(priorities)
             })
         df = pd.DataFrame(orders)
-        df.to_sql('dim_orders', engine, schema=self.schema, if_exists='append', index=False)
-        return pd.read_sql(f"SELECT order_id, order_date FROM {self.schema}.dim_orders", engine)
+        self.route(df, 'dim_orders', 'order_id')
+        return df[['order_id', 'order_date']]
 
     def generate_shipments(self, products_df, suppliers_df, warehouses_df, orders_df):
         logger.info(f"Generating {self.num_shipments} shipments")
         shipments = []
-        for _ in range(self.num_shipments):
+        for shipment_id in range(1, self.num_shipments + 1):
             product = products_df.sample(1).iloc[0]
             order = orders_df.sample(1).iloc[0]
             
@@ -128,6 +169,7 @@ class SupplyChainGenerator:
             quantity = np.random.randint(1, 100)
             
             shipments.append({
+                'shipment_id': shipment_id,
                 'product_id': int(product['product_id']),
                 'supplier_id': int(suppliers_df.sample(1).iloc[0]['supplier_id']),
                 'warehouse_id': int(warehouses_df.sample(1).iloc[0]['warehouse_id']),
@@ -139,7 +181,8 @@ class SupplyChainGenerator:
                 'shipping_time_hours': np.random.randint(12, 120)
             })
         df = pd.DataFrame(shipments)
-        df.to_sql('fact_shipments', engine, schema=self.schema, if_exists='append', index=False)
+        # Co-located with its order: the order_id join never crosses shards
+        self.route(df, 'fact_shipments', 'shipment_id')
 
     def run(self):
         """Main execution flow."""
@@ -151,6 +194,7 @@ class SupplyChainGenerator:
             wh_df = self.generate_warehouses()
             ord_df = self.generate_orders()
             self.generate_shipments(prod_df, supp_df, wh_df, ord_df)
+            self.record_load()
             logger.info("Data generation completed successfully!")
         except Exception as e:
             logger.error(f"Error during data generation: {e}")
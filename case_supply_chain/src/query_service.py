@@ -0,0 +1,45 @@
+from common.prepared import execute_prepared
+from common.query_service import CachedQueryService
+from case_supply_chain.src import sharding
+
+# Cache version token: SupplyChainGenerator.run records a load_runs row on every shard after each
+# load. MAX(shipment_id) would not do — TRUNCATE ... RESTART IDENTITY reissues the same ids.
+SUPPLY_CHAIN_VERSION_SQL = """
+    SELECT load_id::text AS version FROM supply_chain.load_runs ORDER BY loaded_at DESC LIMIT 1
+"""
+
+
+class SupplyChainQueryService(CachedQueryService):
+    """
+    The queries.sql reports, scatter-gathered across shards (see sharding.py) and cached
+    until the next generator load.
+    """
+
+    def __init__(self, router=None, cache=None):
+        super().__init__(cache)
+        self.router = router or sharding.ShardRouter.from_env()
+
+    def version(self):
+        # One token per shard: a load on any shard changes the tuple
+        frames = self.router.map_shards(
+            lambda shard_engine: execute_prepared(shard_engine, 'qs_supply_chain_version', SUPPLY_CHAIN_VERSION_SQL)
+        )
+        return tuple(df.iloc[0, 0] if len(df) else None for df in frames)
+
+    def _report(self, report, query_fn, params=()):
+        return self._cached(report, params, lambda: query_fn(self.router, *params))
+
+    def quantity_by_category(self):
+        return self._report('quantity_by_category', sharding.total_quantity_by_category)
+
+    def shipping_time_by_warehouse(self):
+        return self._report('shipping_time_by_warehouse', sharding.avg_shipping_time_by_warehouse)
+
+    def value_by_supplier(self):
+        return self._report('value_by_supplier', sharding.total_value_by_supplier)
+
+    def top_products_by_quantity(self, limit=5):
+        return self._report('top_products_by_quantity', sharding.top_products_by_quantity, (limit,))
+
+    def value_distribution_by_category(self):
+        return self._report('value_distribution_by_category', sharding.shipment_value_distribution_by_category)
@@ -1,15 +1,41 @@
 import pathlib
+import sys
 from sqlalchemy import text
-from common.db_config import engine
+from case_supply_chain.src.sharding import ShardRouter
 
 BASE_DIR = pathlib.Path(__file__).resolve().parents[1]
 SCHEMA_FILE = BASE_DIR / "sql" / "schema.sql"
+ADVANCED_FILE = BASE_DIR / "sql" / "advanced.sql"
+LOAD_RUNS_FILE = BASE_DIR / "sql" / "load_runs.sql"
 
 def run_schema():
-    with engine.begin() as conn:
-        sql = SCHEMA_FILE.read_text()
-        conn.execute(text(sql))
+    # Every shard carries the full schema: replicated dims plus its partition of orders/shipments
+    sql = SCHEMA_FILE.read_text()
+    for shard_engine in ShardRouter.from_env().engines:
+        with shard_engine.begin() as conn:
+            conn.execute(text(sql))
+    run_load_runs()
+
+def run_load_runs(router=None):
+    # Idempotent, unlike schema.sql — also applied by every generator run (record_load)
+    sql = LOAD_RUNS_FILE.read_text()
+    for shard_engine in (router or ShardRouter.from_env()).engines:
+        with shard_engine.begin() as conn:
+            conn.execute(text(sql))
+
+def run_advanced():
+    # Procedure, view and audit trigger act on shard-local fact_shipments, so every shard needs them.
+    # exec_driver_sql: the plpgsql bodies are sent as-is, without bind-parameter parsing.
+    sql = ADVANCED_FILE.read_text()
+    for shard_engine in ShardRouter.from_env().engines:
+        with shard_engine.begin() as conn:
+            conn.exec_driver_sql(sql)
 
 if __name__ == "__main__":
-    run_schema()
-    print("Schema applied successfully.")
\ No newline at end of file
+    # schema.sql is not re-runnable, so advanced.sql is a separate step once data is loaded
+    if "--advanced" in sys.argv:
+        run_advanced()
+        print("Advanced SQL applied successfully.")
+    else:
+        run_schema()
+        print("Schema applied successfully.")
@@ -0,0 +1,132 @@
+import os
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from sqlalchemy import create_engine
+
+from common.prepared import execute_prepared
+from common.logger import get_logger
+
+logger = get_logger("Supply Chain")
+
+class ShardRouter:
+    """
+    Routes supply_chain rows to N Postgres databases by a hash of order_id.
+    dim_orders and fact_shipments are partitioned; the other dimensions are replicated to every shard.
+    """
+
+    def __init__(self, engines):
+        self.engines = engines
+
+    @classmethod
+    def from_env(cls):
+        """
+        Builds one engine per URL in SUPPLY_CHAIN_SHARD_URLS (comma-separated).
+        Falls back to the single common.db_config engine, i.e. one shard.
+        """
+        urls = [u.strip() for u in os.getenv('SUPPLY_CHAIN_SHARD_URLS', '').split(',') if u.strip()]
+        if not urls:
+            # Imported here: common.db_config builds its engine (and exits without POSTGRES_*) on import
+            from common.db_config import engine
+            return cls([engine])
+        return cls([create_engine(url) for url in urls])
+
+    @property
+    def num_shards(self):
+        return len(self.engines)
+
+    def shard_for(self, order_id):
+        # crc32 instead of hash(): Python's hash is salted per process for strings and
+        # routing must be identical across generator runs, workers and readers.
+        return zlib.crc32(str(int(order_id)).encode()) % self.num_shards
+
+    def split(self, df, key='order_id'):
+        """Splits a DataFrame into {shard_index: rows} by the shard of its key column."""
+        shard_ids = df[key].map(self.shard_for)
+        return {shard: part for shard, part in df.groupby(shard_ids)}
+
+    def map_shards(self, fn):
+        """Runs fn(engine) on every shard in parallel and returns the results in shard order."""
+        with ThreadPoolExecutor(max_workers=self.num_shards) as pool:
+            return list(pool.map(fn, self.engines))
+
+
+# --- Scatter-gather versions of queries.sql ---
+# Each shard returns partial aggregates that can be combined exactly: SUM/COUNT/MIN/MAX are summed
+# or re-reduced, AVG is rebuilt from SUM and COUNT, and LIMIT is applied only after the merge —
+# a per-shard top 5 would miss products whose total is spread across shards.
+
+def _gather(router, name, sql):
+    frames = router.map_shards(lambda shard_engine: execute_prepared(shard_engine, name, sql))
+    return pd.concat(frames, ignore_index=True)
+
+def total_quantity_by_category(router):
+    df = _gather(router, 'sc_quantity_by_category', """
+        SELECT dp.product_category, SUM(fs.quantity) AS total_quantity
+        FROM supply_chain.fact_shipments fs
+        JOIN supply_chain.dim_products dp ON fs.product_id = dp.product_id
+        GROUP BY dp.product_category
+    """)
+    df = df.groupby('product_category', as_index=False)['total_quantity'].sum()
+    return df.sort_values('total_quantity', ascending=False, ignore_index=True)
+
+def avg_shipping_time_by_warehouse(router):
+    df = _gather(router, 'sc_shipping_time_by_warehouse', """
+        SELECT dw.warehouse_name, SUM(fs.shipping_time_hours) AS hours_sum, COUNT(*) AS shipment_count
+        FROM supply_chain.fact_shipments fs
+        JOIN supply_chain.dim_warehouses dw ON fs.warehouse_id = dw.warehouse_id
+        GROUP BY dw.warehouse_name
+    """)
+    df = df.groupby('warehouse_name', as_index=False)[['hours_sum', 'shipment_count']].sum()
+    df['avg_shipping_time_hours'] = (df['hours_sum'] / df['shipment_count']).round(2)
+    df = df[['warehouse_name', 'avg_shipping_time_hours']]
+    return df.sort_values('avg_shipping_time_hours', ignore_index=True)
+
+def total_value_by_supplier(router):
+    df = _gather(router, 'sc_value_by_supplier', """
+        SELECT ds.supplier_name, SUM(fs.shipment_value) AS total_shipment_value
+        FROM supply_chain.fact_shipments fs
+        JOIN supply_chain.dim_suppliers ds ON fs.supplier_id = ds.supplier_id
+        GROUP BY ds.supplier_name
+    """)
+    df['total_shipment_value'] = df['total_shipment_value'].astype(float)
+    df = df.groupby('supplier_name', as_index=False)['total_shipment_value'].sum()
+    df['total_shipment_value'] = df['total_shipment_value'].round(2)
+    return df.sort_values('total_shipment_value', ascending=False, ignore_index=True)
+
+def top_products_by_quantity(router, limit=5):
+    df = _gather(router, 'sc_quantity_by_product', """
+        SELECT dp.product_name, SUM(fs.quantity) AS total_quantity
+        FROM supply_chain.fact_shipments fs
+        JOIN supply_chain.dim_products dp ON fs.product_id = dp.product_id
+        GROUP BY dp.product_name
+    """)
+    df = df.groupby('product_name', as_index=False)['total_quantity'].sum()
+    return df.nlargest(limit, 'total_quantity').reset_index(drop=True)
+
+def shipment_value_distribution_by_category(router):
+    df = _gather(router, 'sc_value_distribution_by_category', """
+        SELECT
+            dp.product_category,
+            MIN(fs.shipment_value) AS min_shipment_value,
+            MAX(fs.shipment_value) AS max_shipment_value,
+            SUM(fs.shipment_value) AS total_shipment_value,
+            COUNT(fs.shipment_id) AS shipment_count
+        FROM supply_chain.fact_shipments fs
+        JOIN supply_chain.dim_products dp ON fs.product_id = dp.product_id
+        GROUP BY dp.product_category
+    """)
+    value_cols = ['min_shipment_value', 'max_shipment_value', 'total_shipment_value']
+    df[value_cols] = df[value_cols].astype(float)
+    df = df.groupby('product_category', as_index=False).agg(
+        min_shipment_value=('min_shipment_value', 'min'),
+        max_shipment_value=('max_shipment_value', 'max'),
+        total_shipment_value=('total_shipment_value', 'sum'),
+        shipment_count=('shipment_count', 'sum'),
+    )
+    df['avg_shipment_value'] = (df['total_shipment_value'] / df['shipment_count']).round(2)
+    df['total_shipment_value'] = df['total_shipment_value'].round(2)
+    df = df[['product_category', 'min_shipment_value', 'max_shipment_value',
+             'avg_shipment_value', 'total_shipment_value', 'shipment_count']]
+    return df.sort_values('total_shipment_value', ascending=False, ignore_index=True)
@@ -0,0 +1,19 @@
+import pandas as pd
+from unittest.mock import patch
+from case_supply_chain.src.sharding import ShardRouter, top_products_by_quantity
+
+def test_sharded_top_products_merges_partials():
+    """Verify that top-N is applied after merging shard partials, not per shard."""
+    router = ShardRouter(['shard_0', 'shard_1'])
+    assert router.shard_for(42) == router.shard_for(42)
+    assert set(router.split(pd.DataFrame({'order_id': range(1, 101)}))) == {0, 1}
+
+    partials = {
+        'shard_0': pd.DataFrame({'product_name': ['A', 'B'], 'total_quantity': [10, 8]}),
+        'shard_1': pd.DataFrame({'product_name': ['B', 'C'], 'total_quantity': [5, 9]}),
+    }
+    with patch('case_supply_chain.src.sharding.execute_prepared',
+               side_effect=lambda shard_engine, name, sql: partials[shard_engine]):
+        df = top_products_by_quantity(router, limit=2)
+    assert df['product_name'].tolist() == ['B', 'A']
+    assert df['total_quantity'].tolist() == [13, 10]
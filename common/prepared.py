@@ -0,0 +1,19 @@
+import pandas as pd
+
+def execute_prepared(engine, name, sql, params=()):
+    """
+    Runs sql as a server-side prepared statement and returns a DataFrame.
+    sql uses $1, $2, ... placeholders. The statement is prepared once per pooled
+    connection (tracked in connection.info) and re-executed without re-planning.
+    """
+    with engine.connect() as conn:
+        prepared = conn.info.setdefault('prepared_statements', set())
+        if name not in prepared:
+            conn.exec_driver_sql(f"PREPARE {name} AS {sql}")
+            prepared.add(name)
+        if params:
+            placeholders = ', '.join(['%s'] * len(params))
+            result = conn.exec_driver_sql(f"EXECUTE {name}({placeholders})", tuple(params))
+        else:
+            result = conn.exec_driver_sql(f"EXECUTE {name}")
+        return pd.DataFrame(result.fetchall(), columns=list(result.keys()))
@@ -0,0 +1,75 @@
+import os
+import threading
+from abc import ABC, abstractmethod
+import time
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+
+from common.logger import get_logger
+
+load_dotenv()
+logger = get_logger("Query Service")
+
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "128"))
+QUERY_CACHE_TTL_SECONDS = int(os.getenv("QUERY_CACHE_TTL_SECONDS", "300"))
+
+
+class QueryCache:
+    """Thread-safe LRU cache whose entries also expire after ttl_seconds."""
+
+    def __init__(self, maxsize=QUERY_CACHE_SIZE, ttl_seconds=QUERY_CACHE_TTL_SECONDS):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class CachedQueryService(ABC):
+    """
+    Base for the per-project report services. Results are cached per
+    (report, parameters, version), where version() returns a token that changes
+    whenever new data is loaded — a new load invalidates entries without any explicit flush.
+    Subclasses live with their project (case_online_retail/src, case_supply_chain/src),
+    so common/ never imports project code.
+    """
+
+    def __init__(self, cache=None):
+        self.cache = cache or QueryCache()
+
+    @abstractmethod
+    def version(self):
+        """Token identifying the currently loaded data; must change with every new load."""
+
+    def _cached(self, report, params, compute):
+        key = (type(self).__name__, report, params, self.version())
+        df = self.cache.get(key)
+        if df is None:
+            logger.info(f"Cache miss: {report}{params} at version {key[-1]}")
+            df = compute()
+            self.cache.put(key, df)
+        # Copy so callers can't mutate the cached frame
+        return df.copy()
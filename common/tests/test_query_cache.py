@@ -0,0 +1,39 @@
+import pandas as pd
+from unittest.mock import MagicMock
+from common.query_service import CachedQueryService, QueryCache
+
+class FakeLoadService(CachedQueryService):
+    """Serves a fixed sequence of version tokens, one per report call."""
+
+    def __init__(self, versions):
+        super().__init__()
+        self.versions = iter(versions)
+
+    def version(self):
+        return next(self.versions)
+
+def test_cached_report_invalidated_by_new_load():
+    """Verify that cached reports are reused until the service's version token changes."""
+    service = FakeLoadService(['load-1', 'load-1', 'load-2', 'load-2'])
+    compute = MagicMock(return_value=pd.DataFrame({'product_category': ['A'], 'total_quantity': [1]}))
+
+    service._cached('quantity_by_category', (), compute)
+    df = service._cached('quantity_by_category', (), compute)
+    assert compute.call_count == 1
+    service._cached('quantity_by_category', (), compute)
+    assert compute.call_count == 2
+
+    # Returned frames are copies — mutating one must not change the cached entry
+    df['total_quantity'] = 99
+    assert service._cached('quantity_by_category', (), compute)['total_quantity'].tolist() == [1]
+    assert compute.call_count == 2
+
+def test_query_cache_evicts_least_recently_used():
+    """Verify that the LRU bound drops the oldest untouched entry."""
+    cache = QueryCache(maxsize=2, ttl_seconds=60)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3